@@ -10,6 +10,7 @@ from qiskit.providers.aer.noise.errors import pauli_error, depolarizing_error
 from qiskit.providers.aer import noise
     
 from qiskit.transpiler import PassManager
+from qiskit.tools.parallel import parallel_map
 
 import numpy as np
 import random
@@ -18,16 +19,23 @@ from matplotlib.patches import Circle, Rectangle
 import copy
 import networkx as nx
 import datetime
+import functools
 from pydub import AudioSegment # pydub can be a bit dodgy and might cause some warnings
 
 
-def get_backend(device):
-    """Returns backend object for device specified by input string."""
+@functools.lru_cache(maxsize=None)
+def _lookup_backend(device):
+    """Returns the backend object for the device specified by the input string, and whether it is an IBMQ backend. Results are cached, so that each backend is only looked up once."""
     try:
-        backend = Aer.get_backend(device)
+        return Aer.get_backend(device), False
     except:
+        return IBMQ.get_backend(device), True
+
+def get_backend(device):
+    """Returns backend object for device specified by input string. The lookup is cached, but the IBMQ notice is still printed every time an IBMQ backend is requested."""
+    backend, ibmq = _lookup_backend(device)
+    if ibmq:
         print("You are using an IBMQ backend. The results for this are provided in accordance with the IBM Q Experience EULA.\nhttps://quantumexperience.ng.bluemix.net/qx/terms") # Legal stuff! Yay!
-        backend = IBMQ.get_backend(device)
     return backend
 
 def get_noise(noisy):
@@ -59,6 +67,16 @@ def get_noise(noisy):
     else:
         noise_model = None
     return noise_model
+
+@functools.lru_cache(maxsize=None)
+def _char2bits(encoding):
+    """Returns a list whose entry for each character code below 256 is the corresponding bit string, padded to `encoding` bits. Other characters are not covered, and should be converted directly."""
+    return [format(j,'0'+str(encoding)+'b') for j in range(256)]
+
+@functools.lru_cache(maxsize=None)
+def _bits2char(encoding):
+    """Returns a dictionary with the bit strings of length `encoding` for character codes below 256 as keys, and the corresponding characters as values. Other bit strings are not covered, and should be converted directly."""
+    return {format(j,'0'+str(encoding)+'b'):chr(j) for j in range(min(256,2**encoding))}
     
 class ladder:
     """An integer implemented on a single qubit. Addition and subtraction are implemented via partial NOT gates."""
@@ -68,26 +86,33 @@ class ladder:
         self.d = d
         self.qr = QuantumRegister(1) # declare our single qubit
         self.cr = ClassicalRegister(1) # declare a single bit to hold the result
-        self.qc = QuantumCircuit(self.qr, self.cr) # combine them in an empty quantum circuit
+        self.angles = [] # the angles of the rx rotations applied so far
         
     def add(self,delta):
         """Changes value of ladder object by the given amount `delta`. This is initially done by addition, but it changes to subtraction once the maximum value of `d` is reached. It will then change back to addition once 0 is reached, and so on.
         
         delta = Amount by which to change the value of the ladder object. Can be int or float."""
-        self.qc.rx(np.pi*delta/self.d,self.qr[0])
+        self.angles.append(np.pi*delta/self.d)
         
     def value(self,device='qasm_simulator',noisy=False,shots=1024):
         """Returns the current version of the ladder operator as an int. If floats have been added to this value, the sum of all floats added thus far are rounded.
         
         device = A string specifying a backend. The noisy behaviour from a real device will result in some randomness in the value given, and can lead to the reported value being less than the true value on average. These effects will be more evident for high `d`.
+        noisy = Noise model to use with a simulator (see `get_noise()`). When supplied, a separate rx gate is applied for each call to `add()`, so that noise builds up with the number of additions (as it would for a real device). Otherwise, all the additions are combined into a single rx gate.
         shots = Number of shots used when extracting results from the qubit. A low value will result in randomness in the value given. This should be neglible when the value is a few orders of magnitude greater than `d`. """  
-        temp_qc = copy.deepcopy(self.qc)
-        temp_qc.barrier(self.qr)
-        temp_qc.measure(self.qr,self.cr)
+        # the rotations are applied separately for noisy simulations, so that the noise on each is included, and combined into one otherwise
+        qc = QuantumCircuit(self.qr, self.cr)
+        if noisy:
+            for angle in self.angles:
+                qc.rx(angle,self.qr[0])
+        else:
+            qc.rx(sum(self.angles),self.qr[0])
+        qc.barrier(self.qr)
+        qc.measure(self.qr,self.cr)
         try:
-            job = execute(temp_qc,backend=get_backend(device),noise_model=get_noise(noisy),shots=shots)
+            job = execute(qc,backend=get_backend(device),noise_model=get_noise(noisy),shots=shots)
         except:
-            job = execute(temp_qc,backend=get_backend(device),shots=shots)
+            job = execute(qc,backend=get_backend(device),shots=shots)
         if '1' in job.result().get_counts():
             p = job.result().get_counts()['1']/shots
         else:
@@ -110,7 +135,7 @@ class twobit:
         """Supplying `state={basis,b}` prepares a twobit with the boolean `b` stored using the measurement type specified by `basis` (which can be 'X', 'Y' or 'Z').
         
         Note that `basis='Y'` (and arbitrary `b`) will result in the twobit giving a random result for both 'X' and 'Z' (and similarly for any one versus the remaining two). """
-        self.qc = QuantumCircuit(self.qr, self.cr)
+        self.qc.data.clear() # empty the existing circuit rather than creating a new one
         if 'Y' in state:
             self.qc.h(self.qr[0])
             if state['Y']:
@@ -132,6 +157,24 @@ class twobit:
         device = A string specifying a backend. The noisy behaviour from a real device will result in some randomness in the value given, even if it has been set to a definite value for a given measurement type. This effect can be reduced using `mitigate=True`.
         shots = Number of shots used when extracting results from the qubit. A value of greater than 1 only has any effect for `mitigate=True`, in which case larger values of `shots` allow for better mitigation.
         mitigate = Boolean specifying whether mitigation should be applied. If so the values obtained over `shots` samples are considered, and the fraction which output `True` is calculated. If this is more than 90%, measure will return `True`. If less than 10%, it will return `False`, otherwise it returns a random value using the fraction as the probability."""
+        p = self._get_prob(basis,device,noisy,shots,mitigate)
+        measured_value = ( p>random.random() )
+        self.prepare({basis:measured_value})
+        
+        return measured_value
+    
+    def values (self,basis,n,device='qasm_simulator',noisy=False,shots=1024,mitigate=True):
+        """Extracts `n` boolean values for the given measurement type, returned as a numpy array. These are all sampled from the results of a single job, rather than running a job for each. The twobit is then reinitialized according to the last of these values. For details of kwargs, see `value()`."""
+        if n<1:
+            raise ValueError("The number of values n must be at least 1, but n="+str(n)+" was given.")
+        p = self._get_prob(basis,device,noisy,shots,mitigate)
+        measured_values = np.random.random(n)<p
+        self.prepare({basis:bool(measured_values[-1])})
+        
+        return measured_values
+    
+    def _get_prob (self,basis,device,noisy,shots,mitigate):
+        """Measures in the given basis and returns the probability of the value `True`, with the mitigation described in `value()` applied if required."""
         if basis=='X':
             self.qc.h(self.qr[0])
         elif basis=='Y':
@@ -153,10 +196,7 @@ class twobit:
                 p = 0
             elif p>0.9:
                 p = 1
-        measured_value = ( p>random.random() )
-        self.prepare({basis:measured_value})
-        
-        return measured_value
+        return p
 
     def X_value (self,device='qasm_simulator',noisy=False,shots=1024,mitigate=True):
         """Extracts the boolean value via the X basis. For details of kwargs, see `value()`."""
@@ -171,13 +211,9 @@ class twobit:
         return self.value('Z',device=device,noisy=noisy,shots=shots,mitigate=mitigate)
     
         
-def bell_correlation (basis,device='qasm_simulator',noisy=False,shots=1024):
-    """Prepares a rotated Bell state of two qubits. Measurement is done in the specified basis for each qubit. The fraction of results for which the two qubits agree is returned.
-    
-    basis = String specifying measurement bases. 'XX' denotes X measurement on each qubit, 'XZ' denotes X measurement on qubit 0 and Z on qubit 1, vice-versa for 'ZX', and 'ZZ' denotes 'Z' measurement on both.
-    device = A string specifying a backend. The noisy behaviour from a real device will result in the correlations being less strong than in the ideal case.
-    shots = Number of shots used when extracting results from the qubit. For shots=1, the returned value will randomly be 0 (if the results for the two qubits disagree) or 1 (if they agree). For large shots, the returned value will be probability for this random process.
-    """
+@functools.lru_cache(maxsize=128)
+def _bell_circuit(basis):
+    """Returns the circuit used by `bell_correlation` for the given basis."""
     qr = QuantumRegister(2)
     cr = ClassicalRegister(2)
     qc = QuantumCircuit(qr,cr)
@@ -196,11 +232,28 @@ def bell_correlation (basis,device='qasm_simulator',noisy=False,shots=1024):
     qc.barrier(qr)
     qc.measure(qr,cr)
     
+    return qc
+
+@functools.lru_cache(maxsize=128)
+def _bell_qobj(basis,device,shots):
+    """Returns the compiled qobj used by `bell_correlation`, so that the circuit is only transpiled once for each combination of basis, device and shots."""
+    return compile(_bell_circuit(basis), get_backend(device), shots=shots, memory=True)
+
+def bell_correlation (basis,device='qasm_simulator',noisy=False,shots=1024):
+    """Prepares a rotated Bell state of two qubits. Measurement is done in the specified basis for each qubit. The fraction of results for which the two qubits agree is returned.
+    
+    basis = String specifying measurement bases. 'XX' denotes X measurement on each qubit, 'XZ' denotes X measurement on qubit 0 and Z on qubit 1, vice-versa for 'ZX', and 'ZZ' denotes 'Z' measurement on both.
+    device = A string specifying a backend. The noisy behaviour from a real device will result in the correlations being less strong than in the ideal case.
+    shots = Number of shots used when extracting results from the qubit. For shots=1, the returned value will randomly be 0 (if the results for the two qubits disagree) or 1 (if they agree). For large shots, the returned value will be probability for this random process.
+    """
+    backend = get_backend(device)
+    qobj = copy.deepcopy(_bell_qobj(basis,device,shots)) # a copy, since running a qobj can temporarily modify its config
     try:
-        job = execute(qc, backend=get_backend(device), noise_model=get_noise(noisy), shots=shots, memory=True)
+        job = backend.run(qobj, noise_model=get_noise(noisy))
     except:
-        job = execute(qc, backend=get_backend(device), shots=shots, memory=True)
-    stats = job.result().get_counts()
+        job = backend.run(qobj)
+    result = job.result()
+    stats = result.get_counts()
     
     P = 0
     for string in stats:
@@ -208,7 +261,48 @@ def bell_correlation (basis,device='qasm_simulator',noisy=False,shots=1024):
         if string in ['00','11']:
             P += p
             
-    return {'P':P, 'samples':job.result().get_memory() }
+    return {'P':P, 'samples':result.get_memory() }
+
+def _superposer_circuit(strings,bias):
+    """Returns the circuit used by `bitstring_superposer` to create a superposition of the given bit strings."""
+    # find the length of the longest string, and pad any that are shorter
+    num = 0
+    for string in strings:
+        num = max(len(string),num)
+    for string in strings:
+        string = '0'*(num-len(string)) + string
+    
+    qr = QuantumRegister(num)
+    cr = ClassicalRegister(num)
+    qc = QuantumCircuit(qr,cr)
+
+    if len(strings)==2**num: # create equal superposition of all if all are asked for
+        for n in range(num):
+            qc.h(qr[n])
+    elif strings[0]==strings[1]: # no superposition needed, so just prepare the string
+        for bit in range(num):
+            if strings[0][bit]=='1':
+                qc.x(qr[bit])
+    else: # create superposition of just two
+        diff = []
+        for bit in range(num):
+            if strings[0][bit]!=strings[1][bit]:
+                diff.append(bit)
+            elif strings[0][bit]=='1':
+                qc.x(qr[bit])
+        frac = np.arccos(np.sqrt(bias))/(np.pi/2)
+        qc.rx(np.pi*frac,qr[diff[0]])
+        for bit in diff[1:]:
+            qc.cx(qr[diff[0]],qr[bit])
+            if strings[0][bit]=='1':
+                qc.x(qr[bit])
+        if strings[0][diff[0]]=='1': # this must come after all the cx gates controlled by this qubit
+            qc.x(qr[diff[0]])
+
+    qc.barrier(qr)
+    qc.measure(qr,cr)
+    
+    return qc
 
 def bitstring_superposer (strings,bias=0.5,device='qasm_simulator',noisy=False,shots=1024):
     """Prepares the superposition of the two given n bit strings. The number of qubits used is equal to the length of the string. The superposition is measured, and the process repeated many times. A dictionary with the fraction of shots for which each string occurred is returned.
@@ -224,58 +318,25 @@ def bitstring_superposer (strings,bias=0.5,device='qasm_simulator',noisy=False,s
     else:
         strings_list = strings
     
-    batch = []
-    for strings in strings_list:
-        
-        # find the length of the longest string, and pad any that are shorter
-        num = 0
-        for string in strings:
-            num = max(len(string),num)
-        for string in strings:
-            string = '0'*(num-len(string)) + string
-        
-        qr = QuantumRegister(num)
-        cr = ClassicalRegister(num)
-        qc = QuantumCircuit(qr,cr)
-
-        if len(strings)==2**num: # create equal superposition of all if all are asked for
-            for n in range(num):
-                qc.h(qr[n])
-        else: # create superposition of just two
-            diff = []
-            for bit in range(num):
-                if strings[0][bit]==strings[1][bit]:
-                    if strings[0][bit]=='1':
-                        qc.x(qr[bit])
-                if strings[0][bit]!=strings[1][bit]:
-                    diff.append(bit)
-            if diff:
-                frac = np.arccos(np.sqrt(bias))/(np.pi/2)
-                qc.rx(np.pi*frac,qr[diff[0]])
-                for bit in diff[1:]:
-                    qc.cx(qr[diff[0]],qr[bit])
-                for bit in diff:
-                    if strings[0][bit]=='1':
-                        qc.x(qr[bit])
-
-        qc.barrier(qr)
-        qc.measure(qr,cr)
-        
-        batch.append(qc)
+    # building circuits in parallel only pays off for large batches, since starting the processes costs much more than a few small circuits
+    if len(strings_list)<100:
+        batch = [_superposer_circuit(strings,bias) for strings in strings_list]
+    else:
+        batch = parallel_map(_superposer_circuit, strings_list, task_args=(bias,))
 
     try:
         job = execute(batch, backend=get_backend(device), noise_model=get_noise(noisy), shots=shots)
     except:
         job = execute(batch, backend=get_backend(device), shots=shots)
+    result = job.result()
     stats_raw_list = []
-    for j in range(len(strings_list)):
-        stats_raw_list.append( job.result().get_counts(batch[j]) )
+    for j in range(len(batch)):
+        stats_raw_list.append( result.get_counts(j) )
 
+    inv_shots = 1/shots
     stats_list = []
     for stats_raw in stats_raw_list:
-        stats = {}
-        for string in stats_raw:
-            stats[string[::-1]] = stats_raw[string]/shots
+        stats = {string[::-1]:count*inv_shots for string,count in stats_raw.items()}
         stats_list.append(stats)
     
     # if only one instance was given, output dict rather than list with a single dict
@@ -300,15 +361,14 @@ def emoticon_superposer (emoticons,bias=0.5,device='qasm_simulator',noisy=False,
     else:
         emoticons_list = emoticons
         
+    char2bits = _char2bits(encoding)
+    bits2char = _bits2char(encoding)
+    
     strings = []
     for emoticons in emoticons_list:
         string = []
         for emoticon in emoticons:
-            bin4emoticon = ""
-            for character in emoticon:
-                bin4char = bin(ord(character))[2:]
-                bin4char = (encoding-len(bin4char))*'0'+bin4char
-                bin4emoticon += bin4char
+            bin4emoticon = ''.join(char2bits[ord(character)] if ord(character)<256 else format(ord(character),'0'+str(encoding)+'b') for character in emoticon)
             string.append(bin4emoticon)
         strings.append(string)
         
@@ -321,25 +381,28 @@ def emoticon_superposer (emoticons,bias=0.5,device='qasm_simulator',noisy=False,
         stats_list = stats
         
     ascii_stats_list = []
+    plt.rc('font', family='monospace')
+    fig, ax = plt.subplots()
     for stats in stats_list:
-        fig = plt.figure()
-        ax=fig.add_subplot(111)
-        plt.rc('font', family='monospace')
+        if not plt.fignum_exists(fig.number): # some backends (such as inline plots) close the figure once shown
+            fig, ax = plt.subplots()
+        ax.clear()
         ascii_stats = {}
         for string in stats:
-            char = chr(int( string[0:encoding] ,2)) # get string of the leftmost bits and convert to an ASCII character
-            char += chr(int( string[encoding:2*encoding] ,2)) # do the same for string of rightmost bits, and add it to the previous character
+            left, right = string[0:encoding], string[encoding:2*encoding]
+            char = bits2char[left] if left in bits2char else chr(int(left,2)) # get string of the leftmost bits and convert to an ASCII character
+            char += bits2char[right] if right in bits2char else chr(int(right,2)) # do the same for string of rightmost bits, and add it to the previous character
             prob = stats[string] # fraction of shots for which this result occurred
             ascii_stats[char] = prob
             # create plot with all characters on top of each other with alpha given by how often it turned up in the output
             try:
-                plt.annotate( char, (0.5,0.5), va="center", ha="center", color = (0,0,0, prob ), size = 300)
+                ax.annotate( char, (0.5,0.5), va="center", ha="center", color = (0,0,0, prob ), size = 300)
             except:
                 pass
         ascii_stats_list.append(ascii_stats)
 
-        plt.axis('off')
-        plt.savefig('outputs/emoticon_'+datetime.datetime.now().strftime("%H:%M:%S %p on %B %d, %Y")+'.png')
+        ax.axis('off')
+        fig.savefig('outputs/emoticon_'+datetime.datetime.now().strftime("%H:%M:%S %p on %B %d, %Y")+'.png')
         plt.show()
     
     # if only one instance was given, output dict rather than list with a single dict
@@ -381,18 +444,10 @@ def _filename_superposer (all_files,files,bias,device,noisy,shots):
         
     stats_list = []
     for full_stats in full_stats_list:
-        Z = 0
-        for j in range(file_num):
-            string = "{0:b}".format(j)
-            string = '0'*(bit_num-len(string)) + string
-            if string in full_stats:
-                Z += full_stats[string]    
-        stats = {}
-        for j in range(file_num):
-            string = "{0:b}".format(j)
-            string = '0'*(bit_num-len(string)) + string
-            if string in full_stats:
-                stats[string] = full_stats[string]/Z
+        # keep only strings that correspond to files, and normalize
+        stats = {string:frac for string,frac in full_stats.items() if int(string,2)<file_num}
+        Z = sum(stats.values())
+        stats = {string:frac/Z for string,frac in stats.items()}
         stats_list.append(stats)
         
     file_stats_list = []
@@ -405,6 +460,11 @@ def _filename_superposer (all_files,files,bias,device,noisy,shots):
     return  file_stats_list
 
 
+@functools.lru_cache(maxsize=64)
+def _load_image(filename):
+    """Returns the image 'images/<filename>.png', which is only read from disk the first time it is requested."""
+    return plt.imread( "images/"+filename+".png" )
+
 def image_superposer (all_images,images,bias=0.5,device='qasm_simulator',noisy=False,shots=1024,figsize=(20,20)):
     """Creates superposition of two images from a set of images.
     
@@ -418,6 +478,7 @@ def image_superposer (all_images,images,bias=0.5,device='qasm_simulator',noisy=F
     image_stats_list = _filename_superposer (all_images,images,bias,device,noisy,shots)
     print(image_stats_list)
     
+    fig, ax = plt.subplots(figsize=figsize)
     for image_stats in image_stats_list:  
         # sort from least to most likely and create corresponding lists of the strings and fractions
         sorted_strings = sorted(image_stats,key=image_stats.get)
@@ -428,14 +489,16 @@ def image_superposer (all_images,images,bias=0.5,device='qasm_simulator',noisy=F
         for j in range(0,n-1):
             alpha.append( ( alpha[j]/(1-alpha[j]) ) * ( sorted_fracs[j+1] / sorted_fracs[j] ) )
 
-        fig, ax = plt.subplots(figsize=figsize)
+        if not plt.fignum_exists(fig.number): # some backends (such as inline plots) close the figure once shown
+            fig, ax = plt.subplots(figsize=figsize)
+        ax.clear()
         for j in reversed(range(n)):
             filename = sorted_strings[j]
             if filename:
-                image = plt.imread( "images/"+filename+".png" )
-                plt.imshow(image,alpha=alpha[j])
-        plt.axis('off')
-        plt.savefig('outputs/image_'+datetime.datetime.now().strftime("%H:%M:%S %p on %B %d, %Y")+'.png')
+                image = _load_image(filename)
+                ax.imshow(image,alpha=alpha[j],origin='upper',interpolation='none')
+        ax.axis('off')
+        fig.savefig('outputs/image_'+datetime.datetime.now().strftime("%H:%M:%S %p on %B %d, %Y")+'.png')
         plt.show()
     
     # if only one instance was given, output dict rather than list with a single dict
@@ -524,9 +587,44 @@ class layout:
         
         for pair in self.pairs:
             self.pos[pair] = [(self.pos[self.pairs[pair][0]][j] + self.pos[self.pairs[pair][1]][j])/2 for j in range(2)]
+        
+        self._cache_key = None # caches used by `calculate_probs()` and `plot()` are built when first needed
+        
+    def _update_caches(self):
+        """Builds the pair arrays, graph and plot dimensions used by `calculate_probs()` and `plot()`. These are rebuilt only if `pairs` or `pos` have changed since they were last built."""
+        key = ( [(pair,tuple(self.pairs[pair])) for pair in self.pairs], [(node,tuple(self.pos[node])) for node in self.pos] )
+        if key==self._cache_key:
+            return
+        
+        # the qubits of each pair as arrays
+        self._pair_names = list(self.pairs)
+        self._pa = np.array([self.pairs[pair][0] for pair in self._pair_names],dtype=np.int64)
+        self._pb = np.array([self.pairs[pair][1] for pair in self._pair_names],dtype=np.int64)
+        
+        self._graph = nx.Graph()
+        for pair in self.pairs:
+            self._graph.add_edge(self.pairs[pair][0],self.pairs[pair][1])
+            self._graph.add_edge(self.pairs[pair][0],pair)
+            self._graph.add_edge(self.pairs[pair][1],pair)
+        
+        self._area = [0,0]
+        for coord in self.pos.values():
+            for j in range(2):
+                self._area[j] = max(self._area[j],coord[j])
+        for j in range(2):
+            self._area[j] = (self._area[j] + 1 )*1.1
+            
+        if self._area[0]>2*self._area[1]:
+            self._ratio = 0.65
+        else:
+            self._ratio = 1
+        
+        self._cache_key = key
   
     def calculate_probs(self,raw_stats):
         """Given a counts dictionary as the input `raw_stats`, a dictionary of probabilities is returned. The keys for these are either integers (referring to qubits) or strings (referring to pairs of neighbouring qubits). For the qubit entries, the corresponding value is the probability that the qubit is in state `1`. For the pair entries, the values are the probabilities that the two qubits disagree (so either the outcome `01` or `10`."""
+        self._update_caches()
+        
         Z = 0
         for string in raw_stats:
             Z += raw_stats[string]
@@ -538,13 +636,25 @@ class layout:
         for n in self.pos:
             probs[n] = 0
         
-        for string in stats:
-            for n in range(self.num):
-                if string[-n-1]=='1':
-                    probs[n] += stats[string]
-            for pair in self.pairs: 
-                if string[-self.pairs[pair][0]-1]!=string[-self.pairs[pair][1]-1]:
-                    probs[pair] += stats[string]
+        counts = np.array([stats[string] for string in stats],dtype=np.float64)
+        if self.num<=64: # strings can be packed into 64 bit ints, with qubit n as bit n
+            bits = np.array([int(string,2) for string in stats],dtype=np.uint64)
+            one = np.uint64(1)
+            column = bits[:,None]
+            shifts = np.arange(self.num,dtype=np.uint64)
+            pa = self._pa.astype(np.uint64)
+            pb = self._pb.astype(np.uint64)
+            probs_qubit = ((column>>shifts)&one).astype(np.float64).T @ counts
+            probs_pair = (((column>>pa)^(column>>pb))&one).astype(np.float64).T @ counts
+        else: # otherwise use a matrix of bit values, with column n for qubit n
+            bits = np.array([[bit=='1' for bit in string[::-1]] for string in stats],dtype=np.uint8)
+            probs_qubit = bits.T @ counts
+            probs_pair = (bits[:,self._pa]^bits[:,self._pb]).T @ counts
+        
+        for n in range(self.num):
+            probs[n] = float(probs_qubit[n])
+        for p,pair in enumerate(self._pair_names):
+            probs[pair] = float(probs_pair[p])
             
         return probs
                     
@@ -556,12 +666,8 @@ class layout:
         The kwargs should all be supplied in the form of dictionaries for which qubit numbers and pair labels are the keys (i.e., the same keys as for the `pos` attribute).
         
         If `probs` is supplied (such as from the output of the `calculate_probs()` method, the labels, colors and sizes of qubits and pairs will be determined by these probabilities. Otherwise, the other kwargs set these properties directly."""                
-        G=nx.Graph()
-        
-        for pair in self.pairs:
-            G.add_edge(self.pairs[pair][0],self.pairs[pair][1])
-            G.add_edge(self.pairs[pair][0],pair)
-            G.add_edge(self.pairs[pair][1],pair)
+        self._update_caches()
+        G = self._graph
         
         if probs:
             
@@ -625,17 +731,8 @@ class layout:
             color_list.append(colors[node])
             size_list.append(sizes[node])
         
-        area = [0,0]
-        for coord in self.pos.values():
-            for j in range(2):
-                area[j] = max(area[j],coord[j])
-        for j in range(2):
-            area[j] = (area[j] + 1 )*1.1
-            
-        if area[0]>2*area[1]:
-            ratio = 0.65
-        else:
-            ratio = 1
+        area = self._area
+        ratio = self._ratio
 
         plt.figure(2,figsize=(2*area[0],2*ratio*area[1])) 
         nx.draw(G, self.pos, node_color = color_list, node_size = size_list, labels = labels, with_labels = True,